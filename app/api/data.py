@@ -1,22 +1,178 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import List, Optional
-from datetime import datetime
-from sqlalchemy import select, func, update
+from datetime import datetime, timezone
+from sqlalchemy import Float, Text, case, cast, literal_column, select, func, update, text, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.database import get_db
+from ..core.argo_index import download_index, index_candidates, parse_dates, platform_numbers, read_index
+from ..core.config import get_settings
+from ..core.database import get_db, get_engine, get_session_factory, IS_POSTGRES
+from ..core.http import get_http_client
 from ..models.argo_data import ArgoProfile, ArgoFloat, ArgoMeasurement
 from ..schemas.argo_data import ArgoProfileResponse, ArgoFloatResponse, MeasurementsResponse
 
 import asyncio
-import os
+import csv
+import io
 import logging
 import math
+import time
 from typing import Tuple
 
+settings = get_settings()
+
 BASE_DATA_HOST = "https://data-argo.ifremer.fr/"
 
+# CSV export: rows stream from the DB in partitions of EXPORT_BATCH_ROWS, each partition
+# is encoded by the C csv writer, and output is only flushed once settings.EXPORT_CHUNK_BYTES
+# have accumulated so one HTTP chunk carries many rows
+EXPORT_COLUMNS = ("platform_number", "cycle_number", "profile_date", "latitude", "longitude", "ocean_region")
+EXPORT_BATCH_ROWS = 1000
+_EXPORT_SELECT = tuple(getattr(ArgoProfile, name) for name in EXPORT_COLUMNS)
+
+
+def _copy_float_text(col):
+    """float8 as text spelled like Python's repr(), for the COPY export.
+
+    Postgres already prints the shortest round-trip digits; only integral values
+    (74 vs 74.0, -0 vs -0.0) and the non-finite spellings differ.
+    """
+    as_text = cast(col, Text)
+    return case(
+        ((col == func.trunc(col)) & (func.abs(col) < 1e15), as_text.concat(".0")),
+        (col == literal_column("'Infinity'::float8"), "inf"),
+        (col == literal_column("'-Infinity'::float8"), "-inf"),
+        (col == literal_column("'NaN'::float8"), "nan"),
+        else_=as_text,
+    )
+
+
+# The COPY path renders dates and floats in SQL, formatted like datetime.isoformat() and
+# repr(), so both export paths write the same text for each value
+_EXPORT_SELECT_COPY = tuple(
+    func.to_char(col, 'YYYY-MM-DD"T"HH24:MI:SS').label(col.key) if col.key == "profile_date"
+    else _copy_float_text(col).label(col.key) if isinstance(col.type, Float)
+    else col
+    for col in _EXPORT_SELECT
+)
+
+# /argo/profiles and /argo/floats select just the response fields as Core rows and
+# serialize them with orjson; response_model stays on the routes for the OpenAPI schema
+_PROFILE_FIELDS = tuple(ArgoProfileResponse.model_fields)
+_PROFILE_COLUMNS = tuple(getattr(ArgoProfile, name) for name in _PROFILE_FIELDS)
+_FLOAT_FIELDS = tuple(ArgoFloatResponse.model_fields)
+_FLOAT_COLUMNS = tuple(getattr(ArgoFloat, name) for name in _FLOAT_FIELDS)
+
+# /argo/stats: per-table row counts, cached for STATS_TTL_SECONDS as (value, monotonic time)
+STATS_TTL_SECONDS = 60.0
+_count_cache: dict[str, tuple[int, float]] = {}
+
+# Argo global profile index, parsed once into platform_number -> (dates, paths) sorted by date
+# (numpy arrays: datetime64[us] and object), and cached per URL as (etag, last_modified, index);
+# later lookups revalidate with a conditional GET
+ArgoIndex = dict[str, tuple["np.ndarray", "np.ndarray"]]
+_INDEX_CACHE: dict[str, tuple[str | None, str | None, ArgoIndex]] = {}
+_INDEX_LOCK = asyncio.Lock()
+
+# Profile ids whose measurements are being fetched by a background task, so repeated
+# requests for a missing profile don't start duplicate downloads
+_FETCHES_IN_FLIGHT: set[int] = set()
+_FETCH_LOCK = asyncio.Lock()
+
+def _parse_index_dt(val: str) -> datetime | None:
+    """Parse an index date to a UTC-naive datetime; YYYYMMDDHHMMSS is tried first as it is the Argo format."""
+    v = (val or "").strip()
+    try:
+        return datetime.strptime(v, "%Y%m%d%H%M%S")
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d", "%Y%m%d"):
+        try:
+            return datetime.strptime(v, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_index(raw: bytes | io.BytesIO) -> ArgoIndex:
+    """Parse the (optionally gzipped) index into platform_number -> (dates, paths), sorted by date.
+
+    Only the path and date columns are read, column-wise (see app.core.argo_index), with
+    _parse_index_dt only used for dates not in the standard YYYYMMDDHHMMSS form.
+    Entries without a parseable date are dropped: they can never be the nearest match.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = read_index(raw, usecols=[0, 1])
+    paths = df[0]
+    platforms = platform_numbers(paths)
+    dates = parse_dates(df[1], _parse_index_dt)
+
+    frame = pd.DataFrame({"platform": platforms, "date": dates, "path": paths}).dropna()
+    frame = frame.sort_values(["platform", "date"])
+    platform_col = frame["platform"].to_numpy(dtype=object)
+    bounds = np.flatnonzero(platform_col[1:] != platform_col[:-1]) + 1
+    date_groups = np.split(frame["date"].to_numpy().astype("datetime64[us]"), bounds)
+    path_groups = np.split(frame["path"].to_numpy(dtype=object), bounds)
+    starts = [0, *bounds.tolist()] if len(frame) else []
+    return {
+        platform_col[start]: (group_dates, group_paths)
+        for start, group_dates, group_paths in zip(starts, date_groups, path_groups)
+    }
+
+
+async def _load_index() -> ArgoIndex | None:
+    """Return the parsed Argo index, downloading it only when the server copy changed.
+
+    The lock coalesces concurrent cache misses into a single download.
+    """
+    try:
+        client = get_http_client()
+    except Exception as e:  # pragma: no cover
+        logging.warning("Cannot create HTTP client for index discovery: %s", e)
+        return None
+
+    async with _INDEX_LOCK:
+        last_err: Exception | None = None
+        for url in index_candidates(str(settings.ARGO_INDEX_URL) if settings.ARGO_INDEX_URL else None):
+            cached = _INDEX_CACHE.get(url)
+            headers = {}
+            if cached is not None:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+            try:
+                r, buf = await download_index(client, url, headers)
+            except Exception as e:
+                last_err = e
+                continue
+            if buf is None:
+                if cached is not None:
+                    return cached[2]
+                last_err = RuntimeError(f"Unexpected 304 from {url}")
+                continue
+            # Parsing millions of lines would stall the event loop; do it in a worker thread
+            index = await asyncio.to_thread(_parse_index, buf)
+            _INDEX_CACHE[url] = (r.headers.get("ETag"), r.headers.get("Last-Modified"), index)
+            return index
+        # Every mirror failed: a stale copy beats no discovery at all
+        for cached in _INDEX_CACHE.values():
+            return cached[2]
+        logging.warning("Index discovery failed to download: %s", last_err)
+        return None
+
+
 async def _fetch_and_store_measurements(profile_id: int, db: AsyncSession) -> bool:
     """If measurements for profile are missing, attempt to fetch NetCDF from Ifremer and store minimal arrays.
 
@@ -24,8 +180,6 @@ async def _fetch_and_store_measurements(profile_id: int, db: AsyncSession) -> bo
     """
     # Lazy imports to avoid hard dependency if env is not prepared
     try:
-        import httpx  # type: ignore
-        import tempfile
         import netCDF4  # type: ignore
         import numpy as np  # type: ignore
     except Exception as e:
@@ -39,107 +193,27 @@ async def _fetch_and_store_measurements(profile_id: int, db: AsyncSession) -> bo
         return False
 
     async def _discover_file_path() -> str | None:
-        # Try to locate the NetCDF path by matching platform_number and nearest profile_date in the global index
-        try:
-            import httpx, gzip
-            from datetime import datetime
-            from ..core.config import settings
-        except Exception as e:  # pragma: no cover
-            logging.warning("Cannot import deps/config for index discovery: %s", e)
-            return None
-
-        base_url = str(settings.ARGO_INDEX_URL) if settings.ARGO_INDEX_URL else None
-        if not base_url:
-            return None
-        candidates = []
-        if base_url.endswith(".gz"):
-            candidates = [base_url, base_url[:-3]]
-        else:
-            candidates = [base_url + ".gz", base_url]
-        candidates += [
-            "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt.gz",
-            "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt",
-            "https://data-argo.ifremer.fr/ar_index_global_prof.txt",
-        ]
-
-        timeout = httpx.Timeout(connect=10.0, read=60.0, write=30.0, pool=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            last_err: Exception | None = None
-            raw: bytes | None = None
-            for url in candidates:
-                try:
-                    r = await client.get(url)
-                    r.raise_for_status()
-                    raw = r.content
-                    break
-                except Exception as e:
-                    last_err = e
-                    continue
-            if raw is None:
-                logging.warning("Index discovery failed to download: %s", last_err)
-                return None
-
-        if raw[:2] == b"\x1f\x8b":
-            try:
-                import gzip
-                raw = gzip.decompress(raw)
-            except Exception:
-                pass
-        text = raw.decode("utf-8", errors="ignore")
-        lines = text.splitlines()
-
-        # Find best match by same platform_number and nearest date
-        from datetime import datetime
-
-        def parse_dt(val: str) -> datetime | None:
-            v = (val or "").strip().replace("Z", "+00:00")
-            for parser in (lambda x: datetime.fromisoformat(x),):
-                try:
-                    return parser(v)
-                except Exception:
-                    pass
-            for fmt in ("%Y-%m-%d", "%Y%m%d%H%M%S", "%Y%m%d"):
-                try:
-                    return datetime.strptime(v, fmt)
-                except Exception:
-                    continue
+        # Locate the NetCDF path by matching platform_number and nearest profile_date in the global index
+        index = await _load_index()
+        entry = index.get(prof.platform_number) if index else None
+        if not entry:
             return None
 
+        dates, paths = entry
         target_dt = prof.profile_date
-        best_path: str | None = None
-        best_delta: float | None = None
-        for line in lines:
-            if not line or line.startswith('#'):
-                continue
-            parts = line.split(',')
-            if len(parts) < 2:
-                continue
-            path = parts[0].strip()
-            date_str = parts[1].strip()
-            # Extract platform from path segments
-            segs = [p for p in path.strip('/').split('/') if p]
-            candidate = None
-            if len(segs) >= 2:
-                candidate = segs[-2]
-                if candidate.lower() in {"profiles", "dac"} and len(segs) >= 3:
-                    candidate = segs[-3]
+        if target_dt is None:
+            # If no date on profile, just take the first match
+            best_path = paths[0]
+        else:
+            # Nearest date is one of the two neighbours of the insertion point
+            target = np.datetime64(target_dt, "us")
+            i = int(np.searchsorted(dates, target))
+            if i == 0:
+                best_path = paths[0]
+            elif i == len(dates):
+                best_path = paths[-1]
             else:
-                candidate = segs[-1] if segs else None
-
-            if not candidate or candidate != prof.platform_number:
-                continue
-
-            if target_dt is None:
-                # If no date on profile, just take the first match
-                best_path = path
-                break
-            dt = parse_dt(date_str)
-            if not dt:
-                continue
-            delta = abs((dt - target_dt).total_seconds())
-            if best_delta is None or delta < best_delta:
-                best_delta = delta
-                best_path = path
+                best_path = paths[i] if dates[i] - target <= target - dates[i - 1] else paths[i - 1]
 
         if best_path:
             # Persist so future calls don't need discovery
@@ -180,123 +254,210 @@ async def _fetch_and_store_measurements(profile_id: int, db: AsyncSession) -> bo
 
     # Download file
     try:
-        # httpx requires specifying all four timeouts when not using a default
-        timeout = httpx.Timeout(connect=10.0, read=120.0, write=60.0, pool=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            r = await client.get(url)
-            r.raise_for_status()
-            content = r.content
+        client = get_http_client()
+        r = await client.get(url)
+        r.raise_for_status()
+        content = r.content
     except Exception as e:
         logging.warning("Failed to download NetCDF for profile %s: %s", profile_id, e)
         return False
 
-    # Write to temp file for netCDF4 to open
+    # Open the downloaded bytes in memory (netCDF-C handles classic and HDF5-based files)
     try:
-        # On Windows, NamedTemporaryFile(delete=True) cannot be reopened by another process.
-        # Use delete=False and remove manually after netCDF4 is done.
-        fd, tmp_path = tempfile.mkstemp(suffix=".nc")
+        ds = netCDF4.Dataset("inmemory.nc", mode='r', memory=content)
         try:
-            with os.fdopen(fd, "wb") as tf:
-                tf.write(content)
-                tf.flush()
-            ds = netCDF4.Dataset(tmp_path, mode='r')
-            try:
-                # Variables can be [n_prof, n_levels] or [n_levels]
-                def pick_var(name_main: str, name_alt: str | None = None):
-                    for nm in [name_main, name_alt]:
-                        if nm and nm in ds.variables:
-                            return ds.variables[nm]
-                    return None
+            # Variables can be [n_prof, n_levels] or [n_levels]
+            def pick_var(name_main: str, name_alt: str | None = None):
+                for nm in [name_main, name_alt]:
+                    if nm and nm in ds.variables:
+                        return ds.variables[nm]
+                return None
+
+            v_pres = pick_var('PRES_ADJUSTED', 'PRES') or pick_var('PRESSURE', None)
+            v_temp = pick_var('TEMP_ADJUSTED', 'TEMP')
+            v_psal = pick_var('PSAL_ADJUSTED', 'PSAL')
+            if v_pres is None and v_temp is None and v_psal is None:
+                return False
 
-                v_pres = pick_var('PRES_ADJUSTED', 'PRES') or pick_var('PRESSURE', None)
-                v_temp = pick_var('TEMP_ADJUSTED', 'TEMP')
-                v_psal = pick_var('PSAL_ADJUSTED', 'PSAL')
-                if v_pres is None and v_temp is None and v_psal is None:
-                    return False
-
-                def read_first_profile(var) -> np.ndarray | None:
-                    if var is None:
-                        return None
-                    data = var[:]
-                    arr = np.array(data)
-                    # Handle masked arrays
-                    if hasattr(data, 'mask'):
-                        arr = np.array(data.filled(np.nan))
-                    if arr.ndim == 1:
-                        return arr
-                    if arr.ndim >= 2:
-                        # choose the first profile with finite values if possible
-                        for i in range(arr.shape[0]):
-                            row = arr[i]
-                            if np.isfinite(row).sum() > 0:
-                                return row
-                        return arr[0]
+            def read_first_profile(var) -> np.ndarray | None:
+                if var is None:
                     return None
+                # Masked values become NaN; unmasked data is returned without a copy
+                arr = np.ma.filled(var[:], np.nan)
+                if arr.ndim == 1:
+                    return arr
+                if arr.ndim >= 2:
+                    # choose the first profile with finite values if possible
+                    has_finite = np.isfinite(arr.reshape(arr.shape[0], -1)).any(axis=1)
+                    return arr[int(np.argmax(has_finite))] if has_finite.any() else arr[0]
+                return None
 
-                pres = read_first_profile(v_pres)
-                temp = read_first_profile(v_temp)
-                psal = read_first_profile(v_psal)
-
-                # Choose depth from pressure (approx 1 dbar ~ 1 m). If both depth and pressure exist pick depth variable if present.
-                depth = pres.copy() if pres is not None else None
-
-                # Sanitize lengths to min common
-                arrays = [a for a in [depth, temp, psal] if a is not None]
-                if not arrays:
-                    return False
-                n = min(int(a.shape[0]) for a in arrays)
-                depth_l = depth[:n].tolist() if depth is not None else [None] * n
-                temp_l = temp[:n].tolist() if temp is not None else [None] * n
-                psal_l = psal[:n].tolist() if psal is not None else [None] * n
-
-                # Build rows skipping all-None entries and coercing non-finite to None
-                def _as_float_or_none(x):
-                    try:
-                        v = float(x)
-                        return v if np.isfinite(v) else None
-                    except Exception:
-                        return None
-
-                payload = []
-                for i in range(n):
-                    d = _as_float_or_none(depth_l[i]) if i < len(depth_l) else None
-                    t = _as_float_or_none(temp_l[i]) if i < len(temp_l) else None
-                    s = _as_float_or_none(psal_l[i]) if i < len(psal_l) else None
-                    if d is None and t is None and s is None:
-                        continue
-                    payload.append({
-                        'profile_id': profile_id,
-                        'depth': d,
-                        'pressure': d,  # store same as depth approx
-                        'temperature': t,
-                        'salinity': s,
-                        'measurement_level': i,
-                        'created_at': None,
-                    })
-
-                if not payload:
-                    return False
-
-                await db.execute(ArgoMeasurement.__table__.insert(), payload)
-                await db.commit()
-                logging.info("Profile %s: inserted %s measurement rows", profile_id, len(payload))
-                return True
-            finally:
-                ds.close()
+            pres = read_first_profile(v_pres)
+            temp = read_first_profile(v_temp)
+            psal = read_first_profile(v_psal)
+
+            # Choose depth from pressure (approx 1 dbar ~ 1 m). If both depth and pressure exist pick depth variable if present.
+            depth = pres
+
+            # Sanitize lengths to min common
+            arrays = [a for a in [depth, temp, psal] if a is not None]
+            if not arrays:
+                return False
+            n = min(int(a.shape[0]) for a in arrays)
+
+            def _column(arr) -> np.ndarray:
+                # float64 of length n with NaN for missing and non-finite values
+                if arr is None:
+                    return np.full(n, np.nan)
+                col = np.asarray(arr[:n], dtype=np.float64)
+                return np.where(np.isfinite(col), col, np.nan)
+
+            d_col, t_col, s_col = _column(depth), _column(temp), _column(psal)
+            # Skip levels where all three variables are missing
+            levels = np.flatnonzero(np.isfinite(d_col) | np.isfinite(t_col) | np.isfinite(s_col))
+            if levels.size == 0:
+                return False
+
+            def _values(col: np.ndarray) -> list:
+                # Python floats with None in place of NaN
+                col = col[levels]
+                return np.where(np.isfinite(col), col, None).tolist()
+
+            # created_at is omitted so the column's server default (now()) fills it
+            columns = ('profile_id', 'depth', 'pressure', 'temperature', 'salinity', 'measurement_level')
+            # pressure is stored same as depth approx
+            records = [
+                (profile_id, d, d, t, sal, lvl)
+                for d, t, sal, lvl in zip(_values(d_col), _values(t_col), _values(s_col), levels.tolist())
+            ]
+
+            if IS_POSTGRES:
+                # Binary COPY on the session's connection, so it commits with the session below
+                conn = await db.connection()
+                raw = (await conn.get_raw_connection()).driver_connection
+                await raw.copy_records_to_table(ArgoMeasurement.__tablename__, records=records, columns=columns)
+            else:
+                await db.execute(ArgoMeasurement.__table__.insert(), [dict(zip(columns, rec)) for rec in records])
+            await db.commit()
+            logging.info("Profile %s: inserted %s measurement rows", profile_id, len(records))
+            return True
         finally:
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+            ds.close()
     except Exception as e:
         logging.warning("Failed to parse/store NetCDF for profile %s: %s", profile_id, e)
         return False
 
 
+async def _fetch_measurements_task(profile_id: int) -> None:
+    """Background fetch for /measurements, using its own session (the request's is closed by then)."""
+    try:
+        async with get_session_factory()() as session:
+            await _fetch_and_store_measurements(profile_id, session)
+    finally:
+        async with _FETCH_LOCK:
+            _FETCHES_IN_FLIGHT.discard(profile_id)
+
+
+async def _iter_copy_csv(stmt):
+    """Yield CSV produced by Postgres itself via COPY (query) TO STDOUT.
+
+    asyncpg delivers COPY data through a callback, so a small bounded queue hands the
+    chunks to this generator (and applies back-pressure when the client is slow).
+    """
+    engine = get_engine()
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=16)
+
+    async def _sink(data: bytearray) -> None:
+        await queue.put(bytes(data))
+
+    async def _copy() -> None:
+        cancelled = False
+        try:
+            async with engine.connect() as conn:
+                raw = (await conn.get_raw_connection()).driver_connection
+                await raw.copy_from_query(compiled.string, *params, output=_sink, format="csv", header=True)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # After cancellation the consumer is gone and a full queue would never drain,
+            # so the end-of-data sentinel is only sent while someone is reading
+            if not cancelled:
+                await queue.put(None)
+
+    task = asyncio.create_task(_copy())
+    try:
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+        # Surface COPY errors instead of silently truncating the download
+        await task
+    finally:
+        if not task.done():
+            # Client went away mid-download: stop the COPY and wait for its connection
+            # to be released rather than leaving the task behind
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def _with_bbox(stmt, lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+    """Add a latitude/longitude bounding-box filter to a lambda_stmt() over ArgoProfile.
+
+    On Postgres the box is expressed as point(lon, lat) <@ box(...) so the SP-GiST
+    index ix_argo_profiles_position can be used; elsewhere four range comparisons.
+    A box covering the whole globe filters nothing and is skipped, so the planner
+    doesn't pick the spatial index for the default (unfiltered) listing.
+    The dialect is chosen here rather than inside the lambda, which only captures the
+    coordinates as bound parameters and so shares one cached statement per shape.
+    An inverted range (min > max) matches nothing on either backend: Postgres would
+    reorder a box's corners, so those go through the range comparisons too.
+    """
+    if lat_min <= -90 and lat_max >= 90 and lon_min <= -180 and lon_max >= 180:
+        return stmt
+    if IS_POSTGRES and lat_min <= lat_max and lon_min <= lon_max:
+        return stmt + (lambda s: s.where(
+            func.point(ArgoProfile.longitude, ArgoProfile.latitude).op("<@", is_comparison=True)(
+                func.box(func.point(lon_min, lat_min), func.point(lon_max, lat_max))
+            )
+        ))
+    return stmt + (lambda s: s.where(
+        ArgoProfile.latitude >= lat_min,
+        ArgoProfile.latitude <= lat_max,
+        ArgoProfile.longitude >= lon_min,
+        ArgoProfile.longitude <= lon_max,
+    ))
+
+
+async def _fast_count(db: AsyncSession, model) -> int:
+    """Row count for a dashboard counter.
+
+    On Postgres this reads the planner estimate from pg_class.reltuples (kept fresh by
+    ANALYZE/autovacuum) instead of scanning the table; reltuples is -1 for a table that
+    was never analyzed, in which case an exact count is taken.
+    """
+    name = model.__tablename__
+    now = time.monotonic()
+    cached = _count_cache.get(name)
+    if cached is not None and now - cached[1] < STATS_TTL_SECONDS:
+        return cached[0]
+    value = None
+    if IS_POSTGRES:
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": name}
+        )
+        if estimate is not None and estimate >= 0:
+            value = int(estimate)
+    if value is None:
+        value = await db.scalar(select(func.count()).select_from(model)) or 0
+    _count_cache[name] = (value, now)
+    return value
+
+
 router = APIRouter(prefix="/argo", tags=["argo"])
 
 
-@router.get("/profiles", response_model=List[ArgoProfileResponse])
+@router.get("/profiles", response_model=List[ArgoProfileResponse], response_class=ORJSONResponse)
 async def get_argo_profiles(
     lat_min: float = Query(-90),
     lat_max: float = Query(90),
@@ -308,64 +469,69 @@ async def get_argo_profiles(
     limit: int = Query(100, le=1000),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = select(ArgoProfile).where(
-        ArgoProfile.latitude >= lat_min,
-        ArgoProfile.latitude <= lat_max,
-        ArgoProfile.longitude >= lon_min,
-        ArgoProfile.longitude <= lon_max,
-    )
+    # lambda_stmt caches the constructed statement per combination of filters present;
+    # the filter values themselves are extracted as bound parameters on each call
+    stmt = _with_bbox(lambda_stmt(lambda: select(*_PROFILE_COLUMNS)), lat_min, lat_max, lon_min, lon_max)
     if start_date:
-        stmt = stmt.where(ArgoProfile.profile_date >= start_date)
+        stmt += lambda s: s.where(ArgoProfile.profile_date >= start_date)
     if end_date:
-        stmt = stmt.where(ArgoProfile.profile_date <= end_date)
+        stmt += lambda s: s.where(ArgoProfile.profile_date <= end_date)
     if ocean_region:
-        stmt = stmt.where(ArgoProfile.ocean_region == ocean_region)
-    stmt = stmt.limit(limit)
+        stmt += lambda s: s.where(ArgoProfile.ocean_region == ocean_region)
+    stmt += lambda s: s.limit(limit)
     res = await db.execute(stmt)
-    rows = res.scalars().all()
-    return rows
+    return ORJSONResponse([dict(zip(_PROFILE_FIELDS, row)) for row in res])
 
 
-@router.get("/floats", response_model=List[ArgoFloatResponse])
+@router.get("/floats", response_model=List[ArgoFloatResponse], response_class=ORJSONResponse)
 async def get_argo_floats(
     platform: Optional[str] = None,
     limit: int = Query(100, le=1000),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = select(ArgoFloat)
+    stmt = lambda_stmt(lambda: select(*_FLOAT_COLUMNS))
     if platform:
-        stmt = stmt.where(ArgoFloat.platform_number == platform)
-    stmt = stmt.limit(limit)
+        stmt += lambda s: s.where(ArgoFloat.platform_number == platform)
+    stmt += lambda s: s.limit(limit)
     res = await db.execute(stmt)
-    return res.scalars().all()
+    return ORJSONResponse([dict(zip(_FLOAT_FIELDS, row)) for row in res])
 
 
 @router.get("/profiles/{profile_id}/measurements", response_model=MeasurementsResponse)
 async def get_profile_measurements(
     profile_id: int,
+    background: BackgroundTasks,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
-    # Fetch all measurements for this profile, ordered by pressure/depth ascending when available
-    stmt = select(ArgoMeasurement).where(ArgoMeasurement.profile_id == profile_id)
-    # Prefer ordering by depth if present else by pressure else by id
-    stmt = stmt.order_by(
-        (ArgoMeasurement.depth.is_(None)).asc(),
-        ArgoMeasurement.depth.asc().nulls_last(),
-        (ArgoMeasurement.pressure.is_(None)).asc(),
-        ArgoMeasurement.pressure.asc().nulls_last(),
+    # Fetch the four columns the response needs for this profile (plain tuples, no ORM objects)
+    # Order by the vertical coordinate the response uses: depth if present, else pressure.
+    # Built once via lambda_stmt; only profile_id varies between calls.
+    stmt = lambda_stmt(lambda: select(
+        ArgoMeasurement.depth,
+        ArgoMeasurement.pressure,
+        ArgoMeasurement.temperature,
+        ArgoMeasurement.salinity,
+    ).where(ArgoMeasurement.profile_id == profile_id).order_by(
+        func.coalesce(ArgoMeasurement.depth, ArgoMeasurement.pressure).asc().nulls_last(),
         ArgoMeasurement.id.asc(),
-    )
+    ))
     res = await db.execute(stmt)
-    rows = res.scalars().all()
-    if rows is None or len(rows) == 0:
-        # Attempt on-demand fetch
-        created = await _fetch_and_store_measurements(profile_id, db)
-        if not created:
-            # Return empty arrays gracefully
-            return MeasurementsResponse(depth=[], temperature=[], salinity=[])
-        # Re-run query
-        res = await db.execute(stmt)
-        rows = res.scalars().all()
+    rows = res.all()
+    if not rows:
+        # Only known profiles can be fetched; without this a bad id would report "pending"
+        # (and schedule a no-op download) on every poll
+        exists_stmt = lambda_stmt(lambda: select(ArgoProfile.id).where(ArgoProfile.id == profile_id))
+        if await db.scalar(exists_stmt) is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        # Fetch from the Argo servers after responding; a later call returns the stored rows
+        async with _FETCH_LOCK:
+            start_fetch = profile_id not in _FETCHES_IN_FLIGHT
+            _FETCHES_IN_FLIGHT.add(profile_id)
+        if start_fetch:
+            background.add_task(_fetch_measurements_task, profile_id)
+        response.headers["X-Argo-Fetch"] = "pending"
+        return MeasurementsResponse(depth=[], temperature=[], salinity=[])
 
     def _finite_or_none(v):
         if v is None:
@@ -376,45 +542,30 @@ async def get_profile_measurements(
         except Exception:
             return None
 
+    # Rows already arrive in output order, so the arrays are built in a single pass
     depth: list[float] = []
-    temp: list[float] = []
-    sal: list[float] = []
-    for m in rows:
+    temp: list[float | None] = []
+    sal: list[float | None] = []
+    for depth_v, pressure_v, temp_v, sal_v in rows:
         # Prefer depth value if present, otherwise derive a rough depth from pressure using ~1 dbar ≈ 1 m (simplification)
-        d_val = _finite_or_none(m.depth)
+        d_val = _finite_or_none(depth_v)
         if d_val is None:
-            d_val = _finite_or_none(m.pressure)
-        t_val = _finite_or_none(m.temperature)
-        s_val = _finite_or_none(m.salinity)
+            d_val = _finite_or_none(pressure_v)
         if d_val is None:
             # Skip points with no vertical coordinate
             continue
-        depth.append(float(d_val))
-        temp.append(float(t_val) if t_val is not None else None)
-        sal.append(float(s_val) if s_val is not None else None)
-
-    # If empty, return empty arrays
-    if not depth:
-        return MeasurementsResponse(depth=[], temperature=[], salinity=[])
-
-    # Optionally filter out points where depth is missing; keep None for temp/sal allowed by schema
-    triples = [(d, t, s) for d, t, s in zip(depth, temp, sal) if d is not None]
-    if not triples:
-        return MeasurementsResponse(depth=[], temperature=[], salinity=[])
+        depth.append(d_val)
+        temp.append(_finite_or_none(temp_v))
+        sal.append(_finite_or_none(sal_v))
 
-    triples_sorted = sorted(triples, key=lambda x: (x[0] is None, x[0] if x[0] is not None else 0))
-    d_sorted = [x[0] for x in triples_sorted]
-    t_sorted = [x[1] for x in triples_sorted]
-    s_sorted = [x[2] for x in triples_sorted]
-
-    return MeasurementsResponse(depth=d_sorted, temperature=t_sorted, salinity=s_sorted)
+    return MeasurementsResponse(depth=depth, temperature=temp, salinity=sal)
 
 
 @router.get("/stats")
 async def get_stats(db: AsyncSession = Depends(get_db)):
-    prof_count = await db.scalar(select(func.count()).select_from(ArgoProfile))
-    float_count = await db.scalar(select(func.count()).select_from(ArgoFloat))
-    return {"profiles": prof_count or 0, "floats": float_count or 0}
+    prof_count = await _fast_count(db, ArgoProfile)
+    float_count = await _fast_count(db, ArgoFloat)
+    return {"profiles": prof_count, "floats": float_count}
 
 
 @router.get("/export", response_class=StreamingResponse)
@@ -427,38 +578,48 @@ async def export_profiles_csv(
     end_date: Optional[datetime] = None,
     ocean_region: Optional[str] = Query(None),
     limit: int = Query(1000, le=10000),
-    db: AsyncSession = Depends(get_db),
 ):
     """Export filtered profiles as CSV"""
-    stmt = select(
-        ArgoProfile.platform_number,
-        ArgoProfile.cycle_number,
-        ArgoProfile.profile_date,
-        ArgoProfile.latitude,
-        ArgoProfile.longitude,
-        ArgoProfile.ocean_region,
-    ).where(
-        ArgoProfile.latitude >= lat_min,
-        ArgoProfile.latitude <= lat_max,
-        ArgoProfile.longitude >= lon_min,
-        ArgoProfile.longitude <= lon_max,
-    )
+    if IS_POSTGRES:
+        # Dates and floats are rendered in SQL the way the csv-writer path formats them
+        stmt = lambda_stmt(lambda: select(*_EXPORT_SELECT_COPY))
+    else:
+        stmt = lambda_stmt(lambda: select(*_EXPORT_SELECT))
+    stmt = _with_bbox(stmt, lat_min, lat_max, lon_min, lon_max)
     if start_date:
-        stmt = stmt.where(ArgoProfile.profile_date >= start_date)
+        stmt += lambda s: s.where(ArgoProfile.profile_date >= start_date)
     if end_date:
-        stmt = stmt.where(ArgoProfile.profile_date <= end_date)
+        stmt += lambda s: s.where(ArgoProfile.profile_date <= end_date)
     if ocean_region:
-        stmt = stmt.where(ArgoProfile.ocean_region == ocean_region)
-    stmt = stmt.limit(limit)
-    res = await db.execute(stmt)
-    rows = res.all()
-
-    def iter_csv():
-        yield "platform_number,cycle_number,profile_date,latitude,longitude,ocean_region\n"
-        for r in rows:
-            platform_number, cycle_number, profile_date, latitude, longitude, ocean_region = r
-            date_str = profile_date.isoformat() if profile_date else ""
-            region = ocean_region or ""
-            yield f"{platform_number},{cycle_number},{date_str},{latitude},{longitude},{region}\n"
-
-    return StreamingResponse(iter_csv(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=argo_profiles.csv"})
+        stmt += lambda s: s.where(ArgoProfile.ocean_region == ocean_region)
+    stmt += lambda s: s.limit(limit)
+    headers = {"Content-Disposition": "attachment; filename=argo_profiles.csv"}
+    if IS_POSTGRES:
+        return StreamingResponse(_iter_copy_csv(stmt), media_type="text/csv", headers=headers)
+
+    chunk_size = max(1, settings.EXPORT_CHUNK_BYTES)
+
+    async def iter_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(EXPORT_COLUMNS)
+        # The session is owned by the generator: dependency teardown runs before the
+        # response body is sent, so a Depends(get_db) session would already be closed.
+        async with get_session_factory()() as session:
+            # yield_per is passed per execution: execution_options() on the lambda_stmt itself
+            # would freeze the first request's bound parameters into the cached statement
+            result = await session.stream(stmt, execution_options={"yield_per": EXPORT_BATCH_ROWS})
+            async for batch in result.partitions():
+                # Transpose once so the date column is formatted in a single comprehension;
+                # None values are written as empty fields by the csv writer.
+                cols = list(zip(*batch))
+                cols[2] = [d.isoformat() if d else None for d in cols[2]]
+                writer.writerows(zip(*cols))
+                if buf.tell() >= chunk_size:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    return StreamingResponse(iter_csv(), media_type="text/csv", headers=headers)
@@ -0,0 +1,112 @@
+"""Column-wise parsing of the Argo global profile index (ar_index_global_prof.txt[.gz]).
+
+Shared by the API's file-path discovery and the ingest/backfill scripts. pandas is
+imported on first use so importing this module stays cheap.
+"""
+import csv
+import gzip
+import io
+from datetime import datetime
+from typing import BinaryIO, Callable, Sequence
+
+# Platform is the directory holding the file, or the one above it for .../profiles/<file>
+PLATFORM_PATTERN = r"^(?:.*?/)?([^/]+)/+(?:(?i:profiles|dac)/+)?[^/]+/*$"
+
+# Public copies of the index, tried after the configured URL
+INDEX_MIRRORS = (
+    "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt.gz",
+    "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt",
+    "https://data-argo.ifremer.fr/ar_index_global_prof.txt",
+)
+
+
+def index_candidates(base_url: str | None) -> list[str]:
+    """Index URLs to try in order: base_url as .gz (smaller) then plain text, then the mirrors.
+
+    Empty when no base URL is configured.
+    """
+    if not base_url:
+        return []
+    if base_url.endswith(".gz"):
+        candidates = [base_url, base_url[:-3]]
+    else:
+        candidates = [base_url + ".gz", base_url]
+    return candidates + list(INDEX_MIRRORS)
+
+
+async def download_index(client, url: str, headers: dict | None = None):
+    """GET url, streaming the body into an in-memory buffer.
+
+    Returns (response, buffer); buffer is None when the server answers 304 Not Modified.
+    """
+    async with client.stream("GET", url, headers=headers) as r:
+        if r.status_code == 304:
+            return r, None
+        r.raise_for_status()
+        buf = io.BytesIO()
+        async for chunk in r.aiter_bytes(1 << 16):
+            buf.write(chunk)
+    buf.seek(0)
+    return r, buf
+
+
+def read_index(source: bytes | BinaryIO, usecols: Sequence[int]):
+    """Read the given columns of the (optionally gzipped) index as strings.
+
+    source is the raw file or a seekable binary buffer holding it; gzip is detected from
+    the magic bytes and decompressed incrementally while parsing.
+    Columns are labelled by position; '#' comment lines and malformed lines are skipped.
+    The header row is kept as data and drops out when its date fails to parse.
+    """
+    import pandas as pd
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    magic = source.read(2)
+    source.seek(0)
+    if magic == b"\x1f\x8b":
+        source = gzip.GzipFile(fileobj=source)
+    return pd.read_csv(
+        source,
+        header=None,
+        usecols=list(usecols),
+        dtype=str,
+        comment="#",
+        quoting=csv.QUOTE_NONE,
+        skipinitialspace=True,
+        on_bad_lines="skip",
+        encoding_errors="ignore",
+    )
+
+
+def platform_numbers(paths):
+    """Platform number for each index file path (NaN when the path has a single segment)."""
+    return paths.str.extract(PLATFORM_PATTERN, expand=False)
+
+
+def parse_dates(values, fallback: Callable[[str], datetime | None]):
+    """Index date strings -> datetime64 Series (NaT where unparseable).
+
+    YYYYMMDDHHMMSS values, the Argo format, are read as numbers and split into fields
+    arithmetically, which is much faster than strptime-style parsing; anything else is
+    passed to fallback, which must return a naive datetime or None.
+    """
+    import pandas as pd
+
+    stamp = pd.to_numeric(values, errors="coerce")
+    stamp = stamp[(stamp >= 1e13) & (stamp < 1e14)].astype("int64")
+    dates = pd.to_datetime(
+        pd.DataFrame({
+            "year": stamp // 10**10,
+            "month": stamp // 10**8 % 100,
+            "day": stamp // 10**6 % 100,
+            "hour": stamp // 10**4 % 100,
+            "minute": stamp // 100 % 100,
+            "second": stamp % 100,
+        }),
+        errors="coerce",
+    ).reindex(values.index)
+    odd = dates.isna() & values.notna()
+    if odd.any():
+        dates[odd] = pd.to_datetime([fallback(v) for v in values[odd]])
+    return dates
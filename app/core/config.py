@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field, AnyHttpUrl
-from typing import List
+from pydantic import Field, AnyHttpUrl, PrivateAttr
+from typing import Any, List
+from functools import lru_cache
 from pathlib import Path
 import os
 
@@ -41,6 +42,21 @@ class Settings(BaseSettings):
     DB_SSLROOTCERT: str | None = Field(default=None)
     # Use certifi CA bundle if no DB_SSLROOTCERT is provided
     DB_USE_CERTIFI: bool = Field(default=True)
+    # Connection pool sizing (per process); connections are recycled after DB_POOL_RECYCLE seconds
+    # and a checkout waits at most DB_POOL_TIMEOUT seconds for a free connection
+    DB_POOL_SIZE: int = Field(default=20)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    DB_POOL_RECYCLE: int = Field(default=1800)
+    DB_POOL_TIMEOUT: int = Field(default=30)
+    # Open a fresh connection per checkout instead of pooling (NullPool); for deployments
+    # where an external pooler (PgBouncer/Supavisor) already does the pooling
+    DB_USE_NULLPOOL: bool = Field(default=False)
+    # Postgres only: turn off JIT for the app's short queries, where JIT compilation costs more
+    # than it saves. Sent as a startup parameter; set to false if your pooler rejects it.
+    DB_DISABLE_JIT: bool = Field(default=True)
+    # asyncpg prepared statement cache. Keep 0 behind PgBouncer/Supavisor in transaction mode;
+    # a direct connection can raise it (e.g. 512) to skip re-preparing repeated queries.
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=0)
     API_PREFIX: str = "/api"
 
     # CORS: comma-separated origins, e.g. http://localhost:5173,https://yourapp.vercel.app
@@ -58,14 +74,32 @@ class Settings(BaseSettings):
     INGEST_REGION: str | None = Field(default=None, description="Region filter: I|P|A or full name like 'Indian'")
     INGEST_LIMIT: int = Field(default=500)
 
+    # CSV export: minimum bytes buffered before a chunk is flushed to the client
+    # (~one Ethernet frame of payload, so each HTTP chunk carries many rows)
+    EXPORT_CHUNK_BYTES: int = Field(default=1490)
+
     # Gemini configuration
     GEMINI_API_KEY: str | None = None
     GEMINI_MODEL: str = Field(default="gemini-1.5-flash")
 
+    # CORS_ORIGINS parsed once when the settings are loaded; see cors_origins_parsed
+    _cors_origins: List[str] | str = PrivateAttr(default="*")
+
+    def model_post_init(self, __context: Any) -> None:
+        self._cors_origins = parse_origins(self.CORS_ORIGINS)
+
+    @property
+    def cors_origins_parsed(self) -> List[str] | str:
+        """'*' or the list of allowed origins, as returned by parse_origins()."""
+        return self._cors_origins
+
     class Config:
         # Always pick up the intended backend .env regardless of cwd; allow override via ENV_FILE
         env_file = os.getenv("ENV_FILE", str(_DEFAULT_ENV_PATH))
         extra = "ignore"
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide Settings, loaded (env + .env file) on first call only."""
+    return Settings()
@@ -1,7 +1,10 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import settings
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
+from .config import get_settings
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from functools import lru_cache
 import os
 import ssl
 try:
@@ -9,31 +12,38 @@ try:
 except Exception:  # pragma: no cover
     certifi = None
 
+settings = get_settings()
 
-Base = declarative_base()
 
+class Base(DeclarativeBase):
+    pass
 
+
+@lru_cache(maxsize=4)
 def _extract_ssl_mode(url: str) -> tuple[str, str | None]:
     """Return (clean_url, ssl_mode) by removing ssl/sslmode from the URL.
 
     ssl_mode is one of: disable, allow, prefer, require, verify-ca, verify-full, or None.
+    Cached: only the configured DATABASE_URL (in its sync and async spellings) is ever passed.
     """
     try:
         parts = urlsplit(url)
-        query_list = list(parse_qsl(parts.query, keep_blank_values=True))
-        q = {k: v for k, v in query_list}
+        query_list = parse_qsl(parts.query, keep_blank_values=True)
+        # Last occurrence wins for the ssl lookups; other parameters keep every occurrence
+        q = dict(query_list)
 
         ssl_mode = None
+        removed = None
         # Prefer explicit sslmode
         if "sslmode" in q:
             ssl_mode = (q.get("sslmode") or "").lower() or None
-            q.pop("sslmode", None)
+            removed = "sslmode"
         # If ssl=true/yes/1 provided, map to 'require'
         elif q.get("ssl", "").lower() in {"true", "1", "yes"}:
             ssl_mode = "require"
-            q.pop("ssl", None)
+            removed = "ssl"
 
-        new_query = urlencode(q)
+        new_query = urlencode([(k, v) for k, v in query_list if k != removed])
         clean = urlunsplit((parts.scheme, parts.netloc, parts.path, new_query, parts.fragment))
         return clean, ssl_mode
     except Exception:
@@ -55,10 +65,18 @@ def _to_async_dsn(url: str) -> str:
 
 ASYNC_DATABASE_URL_RAW = settings.DATABASE_URL
 ASYNC_DATABASE_URL = _to_async_dsn(ASYNC_DATABASE_URL_RAW)
+# Backend flags, fixed for the life of the process; branch on these instead of
+# re-inspecting the URL or engine dialect at request time
+IS_POSTGRES: bool = ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://")
+IS_SQLITE: bool = ASYNC_DATABASE_URL.startswith("sqlite+aiosqlite://")
 
+@lru_cache(maxsize=8)
 def _build_ssl_context(db_sslmode: str | None, rootcert: str | None, use_certifi: bool) -> ssl.SSLContext | bool | None:
     """Translate sslmode/rootcert settings to an asyncpg-compatible value.
 
+    Cached per (mode, rootcert, use_certifi): loading the CA bundle is expensive and the
+    context is shared by all connections.
+
     Returns:
       - ssl.SSLContext when TLS is desired
       - False when TLS is disabled
@@ -93,9 +111,11 @@ def _build_ssl_context(db_sslmode: str | None, rootcert: str | None, use_certifi
 
     return ctx
 
-# Determine connect_args (only for asyncpg)
-connect_args: dict = {}
-if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://"):
+def _connect_args() -> dict:
+    """Driver connect_args (only for asyncpg): TLS context, statement cache, server settings."""
+    connect_args: dict = {}
+    if not IS_POSTGRES:
+        return connect_args
     # Ignore any ssl/sslmode in the URL and prefer explicit env-configured values
     _, url_ssl_mode = _extract_ssl_mode(
         ASYNC_DATABASE_URL_RAW.replace("postgresql://", "postgresql+asyncpg://", 1)
@@ -103,23 +123,79 @@ if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://"):
     )
     # Merge precedence: Settings.DB_SSLMODE > URL sslmode > default
     effective_mode = (settings.DB_SSLMODE or url_ssl_mode or "verify-full")
-    ctx = _build_ssl_context(effective_mode, settings.DB_SSLROOTCERT, settings.DB_USE_CERTIFI)
-    connect_args["ssl"] = ctx
+    connect_args["ssl"] = _build_ssl_context(effective_mode, settings.DB_SSLROOTCERT, settings.DB_USE_CERTIFI)
     # PgBouncer (transaction/statement pooling) is incompatible with asyncpg's prepared
-    # statement cache and causes DuplicatePreparedStatementError. Disable the cache.
+    # statement cache and causes DuplicatePreparedStatementError. Disabled by default.
     # Ref: asyncpg docs, and common PgBouncer guidance.
-    connect_args["statement_cache_size"] = 0
+    connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    # SQLAlchemy's asyncpg adapter keeps its own prepared statement cache on top of asyncpg's
+    connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    server_settings = {"application_name": settings.APP_NAME}
+    if settings.DB_DISABLE_JIT:
+        server_settings["jit"] = "off"
+    connect_args["server_settings"] = server_settings
+    return connect_args
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> AsyncEngine:
+    """Process-wide engine, created on first use (the TLS context is built then, not at import)."""
+    # Pool sizing is for server databases; SQLite (possibly in-memory, StaticPool) keeps its defaults
+    pool_args: dict = {}
+    if settings.DB_USE_NULLPOOL and not IS_SQLITE:
+        pool_args = {"poolclass": NullPool}
+    elif not IS_SQLITE:
+        pool_args = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+    return create_async_engine(
+        ASYNC_DATABASE_URL,
+        future=True,
+        echo=False,
+        connect_args=_connect_args(),
+        pool_pre_ping=True,  # proactively recycle dead/stale connections
+        **pool_args,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_engine(), expire_on_commit=False, class_=AsyncSession)
+
+
+def create_missing_tables(sync_conn) -> None:
+    """Create the tables (with their indexes) that don't exist yet; for use with run_sync.
 
-engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    future=True,
-    echo=False,
-    connect_args=connect_args,
-    pool_pre_ping=True,  # proactively recycle dead/stale connections
-)
-async_session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    Existing names come from one catalog query, where create_all() would probe each table
+    separately; nothing is sent when the schema is already complete.
+    """
+    existing = set(inspect(sync_conn).get_table_names())
+    missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+    if missing:
+        Base.metadata.create_all(sync_conn, tables=missing, checkfirst=False)
+
+
+_schema_ready = False
+
+
+async def ensure_schema() -> None:
+    """Create any missing tables once per process; later calls return immediately.
+
+    Columns and indexes added to existing tables are handled by app.scripts.setup_database.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    # Importing the models registers their tables on Base.metadata
+    from .. import models  # noqa: F401
+    async with get_engine().begin() as conn:
+        await conn.run_sync(create_missing_tables)
+    _schema_ready = True
 
 
 async def get_db() -> AsyncSession:
-    async with async_session_factory() as session:
+    async with get_session_factory()() as session:
         yield session
@@ -0,0 +1,33 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+
+# Shared httpx.AsyncClient for the Argo index and data servers (API and scripts), created on
+# first use so keep-alive/HTTP/2 connections and the TLS context are reused across downloads
+_CLIENT: "httpx.AsyncClient | None" = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    global _CLIENT
+    if _CLIENT is None:
+        import httpx  # type: ignore
+
+        _CLIENT = httpx.AsyncClient(
+            http2=True,
+            # httpx requires specifying all four timeouts when not using a default
+            timeout=httpx.Timeout(connect=10.0, read=120.0, write=60.0, pool=10.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+    return _CLIENT
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (application shutdown, or the end of a script run).
+
+    The client is bound to the running event loop; a later get_http_client() builds a new one.
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
@@ -1,23 +1,36 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Optional
+import asyncio
+import importlib.util
 import time
-from .core.config import settings, parse_origins
+from .core.config import get_settings
 from .api.data import router as data_router
-import os
+from .core.database import ensure_schema
+from .core.http import close_http_client
 import logging
 
-# Gemini setup (lazy import to keep cold-start light)
+# Gemini setup: only check that the library is installed here; it is imported on the first
+# chat request that needs it, keeping protobuf/gRPC off the cold-start path
 try:
-    import google.generativeai as genai
-    _HAS_GENAI = True
-except Exception:
+    _HAS_GENAI = importlib.util.find_spec("google.generativeai") is not None
+except ModuleNotFoundError:
     _HAS_GENAI = False
+# Configured GenerativeModel instances by model name, created once per process
+_model_cache: dict[str, Any] = {}
+
+settings = get_settings()
+# orjson encodes the JSON responses (dicts and response models alike) much faster than json
+app = FastAPI(title=settings.APP_NAME, version="0.1.0", default_response_class=ORJSONResponse)
 
-app = FastAPI(title=settings.APP_NAME, version="0.1.0")
+# Compress responses over 1 KB (CSV exports and large JSON lists shrink several-fold);
+# streamed bodies are compressed chunk by chunk as they are sent
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
-_origins = parse_origins(settings.CORS_ORIGINS)
+_origins = settings.cors_origins_parsed
 allow_origins = _origins if isinstance(_origins, list) else ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +38,8 @@ app.add_middleware(
     allow_credentials=isinstance(_origins, list) and "*" not in allow_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend see that empty measurements are still being fetched
+    expose_headers=["X-Argo-Fetch"],
 )
 
 class ChatQuery(BaseModel):
@@ -53,42 +68,65 @@ async def chat_info():
         "env": settings.ENV,
     }
 
+def _get_model(model_name: str):
+    model = _model_cache.get(model_name)
+    if model is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        model = _model_cache[model_name] = genai.GenerativeModel(model_name)
+    return model
+
+
+# Simple helper to call Gemini in an async-friendly way
+async def _generate_async(model, content: str) -> str:
+    loop = asyncio.get_event_loop()
+    def _call():
+        r = model.generate_content(content)
+        # model may return text in .text or candidates
+        return getattr(r, 'text', None) or (r.candidates[0].content.parts[0].text if getattr(r, 'candidates', None) else '')
+    return await loop.run_in_executor(None, _call)
+
 @app.post(f"{settings.API_PREFIX}/chat/query", response_model=ChatResponse)
 async def chat_query(q: ChatQuery):
-    start = time.time()
+    start = time.perf_counter()
     # If Gemini key available, use it; otherwise fallback to mock
     if _HAS_GENAI and settings.GEMINI_API_KEY:
         try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            model_name = settings.GEMINI_MODEL or "gemini-1.5-flash"
-            model = genai.GenerativeModel(model_name)
+            model = _get_model(settings.GEMINI_MODEL or "gemini-1.5-flash")
             prompt = (
                 "You are an assistant for an oceanography ARGO dashboard called FloatChat. "
                 "Be concise. Answer the user's question."
             )
             resp = await _generate_async(model, f"{prompt}\nUser: {q.message}")
             msg = resp or "(empty response)"
-            return ChatResponse(message=msg, sql_query=None, execution_time=time.time() - start)
+            return ChatResponse(message=msg, sql_query=None, execution_time=time.perf_counter() - start)
         except Exception as e:
             # Log the error and fall back to mock
             logger.exception("Gemini call failed: %s", e)
             if settings.ENV != "prod":
                 mock = f"(Gemini error: {type(e).__name__}) Using mock."
-                return ChatResponse(message=mock, sql_query=None, execution_time=time.time() - start)
+                return ChatResponse(message=mock, sql_query=None, execution_time=time.perf_counter() - start)
     # Mock if no key or library
     sql = "SELECT platform_number, cycle_number FROM argo_profiles ORDER BY profile_date DESC LIMIT 10;"
     reply = f"(Mock) You asked: '{q.message}'."
-    return ChatResponse(message=reply, sql_query=sql, execution_time=time.time() - start)
+    return ChatResponse(message=reply, sql_query=sql, execution_time=time.perf_counter() - start)
 
 
-# Simple helper to call Gemini in an async-friendly way
-import asyncio
-async def _generate_async(model, content: str) -> str:
-    loop = asyncio.get_event_loop()
-    def _call():
-        r = model.generate_content(content)
-        # model may return text in .text or candidates
-        return getattr(r, 'text', None) or (r.candidates[0].content.parts[0].text if getattr(r, 'candidates', None) else '')
-    return await loop.run_in_executor(None, _call)
-
+# Included at import so the routes exist exactly once, with or without the lifespan running;
+# app.api.data itself imports numpy/pandas/netCDF4 lazily, so this stays cheap
 app.include_router(data_router, prefix=settings.API_PREFIX)
+
+
+@app.on_event("startup")
+async def _ensure_schema():
+    # Tables are created once here rather than by each script run or request
+    try:
+        await ensure_schema()
+    except Exception as e:
+        logging.warning("Could not ensure database schema at startup: %s", e)
+
+
+@app.on_event("shutdown")
+async def _close_http_client():
+    await close_http_client()
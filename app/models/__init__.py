@@ -0,0 +1,4 @@
+# Importing app.models registers every model's table on Base.metadata; add new model modules here
+from . import argo_data
+
+__all__ = ["argo_data"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Text
+from sqlalchemy import Integer, Float, String, DateTime, Text, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 from ..core.database import Base
 
@@ -15,7 +15,7 @@ class ArgoFloat(Base):
     status: Mapped[str | None] = mapped_column(String(20), nullable=True)
     data_center: Mapped[str | None] = mapped_column(String(10), nullable=True)
     project_name: Mapped[str | None] = mapped_column(String(50), nullable=True)
-    created_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[DateTime | None] = mapped_column(DateTime, server_default=func.now(), nullable=True)
     updated_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
 
 
@@ -23,7 +23,7 @@ class ArgoProfile(Base):
     __tablename__ = "argo_profiles"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
-    platform_number: Mapped[str] = mapped_column(String(20), index=True, nullable=False)
+    platform_number: Mapped[str] = mapped_column(String(20), nullable=False)
     cycle_number: Mapped[int] = mapped_column(Integer, nullable=False)
     profile_date: Mapped[DateTime | None] = mapped_column(DateTime, index=True, nullable=True)
     latitude: Mapped[float] = mapped_column(Float, nullable=False)
@@ -32,16 +32,33 @@ class ArgoProfile(Base):
     positioning_system: Mapped[str | None] = mapped_column(String(10), nullable=True)
     vertical_sampling_scheme: Mapped[str | None] = mapped_column(String(20), nullable=True)
     data_center: Mapped[str | None] = mapped_column(String(10), nullable=True)
-    ocean_region: Mapped[str | None] = mapped_column(String(50), index=True, nullable=True)
+    ocean_region: Mapped[str | None] = mapped_column(String(50), nullable=True)
     file_path: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[DateTime | None] = mapped_column(DateTime, server_default=func.now(), nullable=True)
+
+    # platform_number and ocean_region are indexed as the leading column of these composites
+    __table_args__ = (
+        # Per-platform lookups ordered or ranged by date (file_path backfill, latest profile per float)
+        Index("ix_argo_profiles_platform_date", "platform_number", "profile_date"),
+        # Optional ocean_region equality + profile_date range in the list/export filters
+        Index("ix_argo_profiles_ocean_date", "ocean_region", "profile_date"),
+    )
+
+
+# Bounding-box filters are written as point(longitude, latitude) <@ box(...) on Postgres;
+# this SP-GiST expression index answers them without a sequential scan (Postgres only)
+Index(
+    "ix_argo_profiles_position",
+    func.point(ArgoProfile.longitude, ArgoProfile.latitude),
+    postgresql_using="spgist",
+).ddl_if(dialect="postgresql")
 
 
 class ArgoMeasurement(Base):
     __tablename__ = "argo_measurements"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
-    profile_id: Mapped[int] = mapped_column(Integer, index=True, nullable=False)
+    profile_id: Mapped[int] = mapped_column(Integer, nullable=False)
     pressure: Mapped[float | None] = mapped_column(Float, nullable=True)
     pressure_qc: Mapped[int | None] = mapped_column(Integer, nullable=True)
     temperature: Mapped[float | None] = mapped_column(Float, nullable=True)
@@ -50,7 +67,12 @@ class ArgoMeasurement(Base):
     salinity_qc: Mapped[int | None] = mapped_column(Integer, nullable=True)
     depth: Mapped[float | None] = mapped_column(Float, nullable=True)
     measurement_level: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    created_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[DateTime | None] = mapped_column(DateTime, server_default=func.now(), nullable=True)
+
+    __table_args__ = (
+        # A profile's levels in order; also serves plain profile_id lookups
+        Index("ix_argo_measurements_profile_level", "profile_id", "measurement_level"),
+    )
 
 
 class QueryHistory(Base):
@@ -63,4 +85,4 @@ class QueryHistory(Base):
     execution_time: Mapped[float | None] = mapped_column(Float, nullable=True)
     result_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     ai_response: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[DateTime | None] = mapped_column(DateTime, server_default=func.now(), nullable=True)
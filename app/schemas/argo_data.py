@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
 
@@ -13,8 +13,7 @@ class ArgoProfileResponse(BaseModel):
     ocean_region: Optional[str] = None
     file_path: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ArgoFloatResponse(BaseModel):
@@ -26,8 +25,7 @@ class ArgoFloatResponse(BaseModel):
     deployment_longitude: Optional[float] = None
     data_center: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MeasurementsResponse(BaseModel):
@@ -35,5 +33,4 @@ class MeasurementsResponse(BaseModel):
     temperature: list[Optional[float]]
     salinity: list[Optional[float]]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
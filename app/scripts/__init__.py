@@ -0,0 +1,11 @@
+def run_main(coro):
+    """Run a script's top-level coroutine to completion and return its result.
+
+    Uses uvloop (installed with uvicorn[standard]) when available for a lower-overhead
+    event loop, otherwise asyncio.
+    """
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    return run(coro)
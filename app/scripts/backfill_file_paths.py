@@ -1,143 +1,140 @@
-import asyncio
+import io
+from bisect import bisect_left
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, List, Tuple
 
-import httpx
+import pandas as pd
 from sqlalchemy import select, update
 
-from ..core.config import settings
-from ..core.database import async_session_factory
+from ..core.argo_index import download_index, index_candidates, parse_dates, platform_numbers, read_index
+from ..core.config import get_settings
+from ..core.database import get_session_factory
+from ..core.http import close_http_client, get_http_client
 from ..models.argo_data import ArgoProfile
+from . import run_main
 
+settings = get_settings()
 
-def _parse_index(raw: bytes) -> List[Tuple[str, datetime | None, float | None, float | None, str]]:
-    """Return list of tuples: (platform_number, date, lat, lon, file_path)."""
-    if raw[:2] == b"\x1f\x8b":
-        import gzip
-        try:
-            raw = gzip.decompress(raw)
-        except Exception:
-            pass
-    text = raw.decode("utf-8", errors="ignore")
-    lines = text.splitlines()
+# Profiles are streamed, and their file_path updates sent as executemany batches, this many rows at a time
+UPDATE_BATCH_SIZE = 1000
+
+
+def _parse_index(raw: bytes | io.BytesIO) -> pd.DataFrame:
+    """Return index entries as a DataFrame: platform_number, date (NaT if unparseable), file_path.
 
+    The file is read column-wise (see app.core.argo_index); parse_dt only sees dates
+    that are not in the standard YYYYMMDDHHMMSS form.
+    """
     def parse_dt(val: str) -> datetime | None:
+        # Pick the parser from the value's shape instead of trying each until one doesn't raise
         v = (val or "").strip().replace("Z", "+00:00")
         try:
-            return datetime.fromisoformat(v)
-        except Exception:
-            pass
-        for fmt in ("%Y-%m-%d", "%Y%m%d%H%M%S", "%Y%m%d"):
-            try:
-                return datetime.strptime(v, fmt)
-            except Exception:
-                continue
-        return None
-
-    out: List[Tuple[str, datetime | None, float | None, float | None, str]] = []
-    for line in lines:
-        if not line or line.startswith('#'):
-            continue
-        parts = line.split(',')
-        if len(parts) < 2:
-            continue
-        file_path = parts[0].strip()
-        date_str = parts[1].strip()
-        lat = None
-        lon = None
-        try:
-            lat = float(parts[2]) if len(parts) > 2 else None
-            lon = float(parts[3]) if len(parts) > 3 else None
-        except Exception:
-            pass
-        # Extract platform_number from path
-        segs = [p for p in file_path.strip('/').split('/') if p]
-        platform_number = None
-        if len(segs) >= 2:
-            platform_number = segs[-2]
-            if platform_number.lower() in {"profiles", "dac"} and len(segs) >= 3:
-                platform_number = segs[-3]
-        else:
-            platform_number = segs[-1] if segs else None
-        if not platform_number:
-            continue
-        dt = parse_dt(date_str)
-        out.append((platform_number, dt, lat, lon, file_path))
-    return out
+            if v.isascii() and v.isdigit():
+                if len(v) == 8:
+                    return datetime(int(v[:4]), int(v[4:6]), int(v[6:8]))
+                if len(v) == 14:
+                    return datetime(
+                        int(v[:4]), int(v[4:6]), int(v[6:8]), int(v[8:10]), int(v[10:12]), int(v[12:14])
+                    )
+                return None
+            dt = datetime.fromisoformat(v)
+            # Compare as naive UTC, like the profile dates
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+            return dt
+        except (ValueError, OverflowError):
+            return None
+
+    df = read_index(raw, usecols=[0, 1])
+    entries = pd.DataFrame({
+        "platform_number": platform_numbers(df[0]),
+        "date": parse_dates(df[1], parse_dt),
+        "file_path": df[0],
+    })
+    return entries.dropna(subset=["platform_number"])
 
 
 async def main(limit: int | None = None):
     base_url = str(settings.ARGO_INDEX_URL) if settings.ARGO_INDEX_URL else None
     if not base_url:
         raise RuntimeError("ARGO_INDEX_URL not configured")
-    candidates = []
-    if base_url.endswith('.gz'):
-        candidates = [base_url, base_url[:-3]]
-    else:
-        candidates = [base_url + '.gz', base_url]
-    candidates += [
-        "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt.gz",
-        "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt",
-        "https://data-argo.ifremer.fr/ar_index_global_prof.txt",
-    ]
+    candidates = index_candidates(base_url)
 
     # Download index
-    timeout = httpx.Timeout(connect=10.0, read=120.0, write=60.0, pool=10.0)
     raw = None
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        last_err = None
+    client = get_http_client()
+    last_err = None
+    try:
         for url in candidates:
             try:
-                r = await client.get(url)
-                r.raise_for_status()
-                raw = r.content
+                _, raw = await download_index(client, url)
                 break
             except Exception as e:
                 last_err = e
-        if raw is None:
-            raise RuntimeError(f"Failed to download index: {last_err}")
-
-    rows = _parse_index(raw)
-    # Bucket by platform for quick nearest-date lookup
-    by_platform: Dict[str, List[Tuple[datetime | None, str]]] = defaultdict(list)
-    for platform, dt, _la, _lo, path in rows:
-        by_platform[platform].append((dt, path))
-
-    async with async_session_factory() as session:
-        # Pull profiles missing file_path
-        stmt = select(ArgoProfile).where((ArgoProfile.file_path.is_(None)) | (ArgoProfile.file_path == ''))
+    finally:
+        # The index is the only download; don't leave the client bound to this event loop
+        await close_http_client()
+    if raw is None:
+        raise RuntimeError(f"Failed to download index: {last_err}")
+
+    entries = _parse_index(raw)
+    # Bucket by platform (NaT becomes None)
+    buckets: Dict[str, List[Tuple[datetime | None, str]]] = defaultdict(list)
+    dates = entries["date"].to_numpy().astype("datetime64[us]").tolist()
+    for platform, dt, path in zip(entries["platform_number"].tolist(), dates, entries["file_path"].tolist()):
+        buckets[platform].append((dt, path))
+    # Per platform: first path in index order (used when there is no date to match on),
+    # plus the dated entries sorted by date so the nearest one can be found by bisection
+    first_path: Dict[str, str] = {}
+    by_platform: Dict[str, Tuple[List[datetime], List[str]]] = {}
+    for platform, items in buckets.items():
+        first_path[platform] = items[0][1]
+        dated = sorted((item for item in items if item[0] is not None), key=lambda item: item[0])
+        by_platform[platform] = ([dt for dt, _ in dated], [path for _, path in dated])
+    del buckets
+
+    async with get_session_factory()() as session:
+        # Stream the profiles missing file_path in chunks rather than loading them all;
+        # only the columns needed for matching are fetched
+        stmt = (
+            select(ArgoProfile.id, ArgoProfile.platform_number, ArgoProfile.profile_date)
+            .where((ArgoProfile.file_path.is_(None)) | (ArgoProfile.file_path == ''))
+            .execution_options(yield_per=UPDATE_BATCH_SIZE)
+        )
         if limit and limit > 0:
             stmt = stmt.limit(limit)
-        res = await session.execute(stmt)
-        profs = res.scalars().all()
+        result = await session.stream(stmt)
 
-        updates = 0
-        for p in profs:
-            candidates = by_platform.get(p.platform_number)
-            if not candidates:
+        updated = 0
+        pending: List[dict] = []
+        async for profile_id, platform_number, target in result:
+            if platform_number not in first_path:
                 continue
-            if p.profile_date is None:
-                chosen = candidates[0][1]
+            dates, paths = by_platform[platform_number]
+            if target is None or not dates:
+                chosen = first_path[platform_number]
             else:
-                # Pick nearest date
-                best = None
-                best_delta = None
-                for dt, path in candidates:
-                    if dt is None:
-                        continue
-                    delta = abs((dt - p.profile_date).total_seconds())
-                    if best is None or best_delta is None or delta < best_delta:
-                        best = path
-                        best_delta = delta
-                chosen = best or candidates[0][1]
-            await session.execute(
-                update(ArgoProfile).where(ArgoProfile.id == p.id).values(file_path=chosen)
-            )
-            updates += 1
+                # Nearest date is one of the two neighbours of the insertion point
+                i = bisect_left(dates, target)
+                if i == 0:
+                    chosen = paths[0]
+                elif i == len(dates):
+                    chosen = paths[-1]
+                else:
+                    chosen = paths[i] if dates[i] - target <= target - dates[i - 1] else paths[i - 1]
+            pending.append({"id": profile_id, "file_path": chosen})
+            if len(pending) >= UPDATE_BATCH_SIZE:
+                # ORM bulk UPDATE by primary key: one executemany per batch instead of a round trip per row
+                await session.execute(update(ArgoProfile), pending)
+                updated += len(pending)
+                pending = []
+        if pending:
+            await session.execute(update(ArgoProfile), pending)
+            updated += len(pending)
         await session.commit()
-        print(f"Updated file_path for {updates} profiles")
+        print(f"Updated file_path for {updated} profiles")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
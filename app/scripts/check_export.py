@@ -0,0 +1,39 @@
+import sys
+import httpx
+from ..core.config import get_settings
+from ..main import app
+from . import run_main
+
+settings = get_settings()
+
+# Filter sets run back to back, so a statement cached by the first call is reused with
+# different bound parameters; /argo/profiles applies the same filters and is the reference
+QUERIES = (
+    {"limit": 5},
+    {"limit": 1},
+    {"lat_min": -90, "lat_max": 90, "lon_min": -180, "lon_max": 179},
+    {"lat_min": 0, "lat_max": 16, "lon_min": -180, "lon_max": 179},
+    {"lat_min": 0, "lat_max": 13, "lon_min": -180, "lon_max": 179},
+)
+
+
+async def main() -> bool:
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        for params in QUERIES:
+            export = await client.get(f"{settings.API_PREFIX}/argo/export", params=params)
+            profiles = await client.get(f"{settings.API_PREFIX}/argo/profiles", params=params)
+            export.raise_for_status()
+            profiles.raise_for_status()
+            # Header line excluded
+            exported = len(export.text.splitlines()) - 1
+            expected = len(profiles.json())
+            status = "OK" if exported == expected else "MISMATCH"
+            ok &= exported == expected
+            print(f"{status} {params}: export={exported} profiles={expected}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_main(main()) else 1)
@@ -1,36 +1,73 @@
 import asyncio
-import gzip
+import io
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Sequence
 
-import httpx
+import pandas as pd
 from sqlalchemy import select, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.config import settings
-from ..core.database import async_session_factory
+from ..core.argo_index import download_index, index_candidates, parse_dates, platform_numbers, read_index
+from ..core.config import get_settings
+from ..core.database import get_session_factory, IS_POSTGRES
+from ..core.http import close_http_client, get_http_client
 from ..models.argo_data import ArgoProfile, ArgoFloat
-from ..core.database import Base, engine
+from . import run_main
 
+settings = get_settings()
 
-def _matches_region(line: str, region: Optional[str], ocean_col: Optional[str] = None) -> bool:
-    if not region:
-        return True
+# Columns written for each ingested profile, in record order
+PROFILE_COLUMNS = (
+    "platform_number", "cycle_number", "profile_date", "latitude", "longitude",
+    "ocean_region", "file_path", "created_at",
+)
+
+# Platforms are looked up in argo_floats this many at a time (bound parameters per IN list)
+LOOKUP_BATCH_SIZE = 1000
+
+
+# Single-letter basin codes used in the index ocean column
+_BASIN_NAMES = {"A": "atlantic", "P": "pacific", "I": "indian"}
+
+
+def _region_mask(paths: pd.Series, oceans: pd.Series, region: str) -> pd.Series:
+    """Boolean mask of index rows whose file path or ocean column matches region.
+
+    indian/pacific/atlantic (or anything starting with i/p/a) match the basin name in
+    either column, with single-letter ocean codes expanded; any other region is a
+    case-insensitive substring match.
+    """
     r = region.lower()
-    text = line.lower()
-    oc_raw = (ocean_col or "").strip()
+    oceans = oceans.fillna("").str.strip()
+    text = (paths.fillna("") + "," + oceans).str.lower()
     # Map single-letter basin code to full label when needed
-    basin_map = {"A": "atlantic", "P": "pacific", "I": "indian"}
-    oc = basin_map.get(oc_raw.upper(), oc_raw.lower())
-    # Use the explicit ocean column when available
-    if r.startswith("i") or "indian" in r:
-        return "indian" in oc or "/indian_ocean/" in text or "indian" in text
-    if r.startswith("p") or "pacific" in r:
-        return "pacific" in oc or "/pacific_ocean/" in text or "pacific" in text
-    if r.startswith("a") or "atlantic" in r:
-        return "atlantic" in oc or "/atlantic_ocean/" in text or "atlantic" in text
+    oc = oceans.str.upper().map(_BASIN_NAMES).fillna(oceans.str.lower())
+    for name in ("indian", "pacific", "atlantic"):
+        if r.startswith(name[0]) or name in r:
+            return oc.str.contains(name, regex=False) | text.str.contains(name, regex=False)
     # Fallback contains
-    return r in text or r in oc
+    return text.str.contains(r, regex=False) | oc.str.contains(r, regex=False)
+
+
+def _fast_parse_argo_date(v: str) -> Optional[datetime]:
+    """Slice-parse the fixed-width forms YYYYMMDD, YYYYMMDDHHMMSS and YYYY-MM-DD.
+
+    Returns None for anything else (including impossible dates) so callers can fall back
+    to the general parsers.
+    """
+    if not v.isascii():
+        return None
+    try:
+        if len(v) in (8, 14) and v.isdigit():
+            return datetime(
+                int(v[0:4]), int(v[4:6]), int(v[6:8]),
+                int(v[8:10] or 0), int(v[10:12] or 0), int(v[12:14] or 0),
+            )
+        if len(v) == 10 and v[4] == "-" and v[7] == "-":
+            return datetime(int(v[0:4]), int(v[5:7]), int(v[8:10]))
+    except ValueError:
+        pass
+    return None
 
 
 def _parse_index_date(val: str) -> Optional[datetime]:
@@ -41,6 +78,10 @@ def _parse_index_date(val: str) -> Optional[datetime]:
     v = (val or "").strip()
     if not v:
         return None
+    # Fixed-width forms first: slicing is much cheaper than fromisoformat/strptime
+    dt = _fast_parse_argo_date(v)
+    if dt is not None:
+        return dt
     # Common: YYYY-MM-DD or ISO strings
     # Normalize 'Z' to +00:00 for fromisoformat
     try:
@@ -69,29 +110,35 @@ def _parse_index_date(val: str) -> Optional[datetime]:
     return None
 
 
-async def _ensure_float(session: AsyncSession, platform_number: str):
-    # Minimal upsert: insert if not exists
-    res = await session.execute(select(ArgoFloat).where(ArgoFloat.platform_number == platform_number).limit(1))
-    if res.scalars().first() is None:
-        await session.execute(insert(ArgoFloat).values(platform_number=platform_number, created_at=datetime.utcnow()))
-
-
-async def _fetch_with_retries(urls: Sequence[str]) -> bytes:
-    timeout = httpx.Timeout(connect=10.0, read=60.0, write=30.0, pool=10.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        last_err: Exception | None = None
-        for url in urls:
-            for attempt in range(3):
-                try:
-                    r = await client.get(url)
-                    r.raise_for_status()
-                    return r.content
-                except Exception as e:
-                    last_err = e
-                    await asyncio.sleep(1.5 * (attempt + 1))
-        if last_err:
-            raise last_err
-        raise RuntimeError("Failed to fetch any index URL")
+async def _ensure_floats(session: AsyncSession, platforms: Sequence[str], now: datetime):
+    # Insert the platforms that have no float row yet: one SELECT ... IN per chunk to find
+    # the existing ones, then a single executemany for the rest
+    existing: set[str] = set()
+    for i in range(0, len(platforms), LOOKUP_BATCH_SIZE):
+        chunk = platforms[i:i + LOOKUP_BATCH_SIZE]
+        res = await session.execute(
+            select(ArgoFloat.platform_number).where(ArgoFloat.platform_number.in_(chunk)).distinct()
+        )
+        existing.update(res.scalars())
+    missing = [{"platform_number": p, "created_at": now} for p in platforms if p not in existing]
+    if missing:
+        await session.execute(insert(ArgoFloat), missing)
+
+
+async def _fetch_with_retries(urls: Sequence[str]) -> io.BytesIO:
+    client = get_http_client()
+    last_err: Exception | None = None
+    for url in urls:
+        for attempt in range(3):
+            try:
+                _, buf = await download_index(client, url)
+                return buf
+            except Exception as e:
+                last_err = e
+                await asyncio.sleep(1.5 * (attempt + 1))
+    if last_err:
+        raise last_err
+    raise RuntimeError("Failed to fetch any index URL")
 
 
 async def ingest_from_index(days_back: int, region: Optional[str], limit: int):
@@ -100,107 +147,74 @@ async def ingest_from_index(days_back: int, region: Optional[str], limit: int):
         raise RuntimeError("ARGO_INDEX_URL not configured")
 
     # Prefer gz (smaller), then txt, then known mirror(s)
-    candidates = []
-    if base_url.endswith(".gz"):
-        candidates = [base_url, base_url[:-3]]
-    else:
-        candidates = [base_url + ".gz", base_url]
-    # Mirrors
-    candidates += [
-        # Add more mirrors first to improve reliability
-        "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt.gz",
-        "https://usgodae.org/ftp/outgoing/argo/ar_index_global_prof.txt",
-        "https://data-argo.ifremer.fr/ar_index_global_prof.txt",
-    ]
+    candidates = index_candidates(base_url)
 
-    raw = await _fetch_with_retries(candidates)
-    # Decompress if gz
-    if raw[:2] == b"\x1f\x8b":
-        try:
-            raw = gzip.decompress(raw)
-        except Exception:
-            pass
-    text = raw.decode("utf-8", errors="ignore")
-    lines = text.splitlines()
+    try:
+        raw = await _fetch_with_retries(candidates)
+    finally:
+        # The index is the only download; don't leave the client bound to this event loop
+        await close_http_client()
+    # Index columns are 'file, date, latitude, longitude, ocean, ...'; read the first five
+    df = read_index(raw, usecols=[0, 1, 2, 3, 4])
 
     # Give a cushion to increase matches if dates have different TZ/rounding
     cutoff = datetime.utcnow() - timedelta(days=max(1, days_back))
 
-    # Index format: skip comment lines starting with '#'
+    # Date and coordinate filters run over whole columns; entries without a parseable
+    # date or numeric lat/lon are dropped
+    dates = parse_dates(df[1], _parse_index_date)
+    lats = pd.to_numeric(df[2], errors="coerce")
+    lons = pd.to_numeric(df[3], errors="coerce")
+    recent = (dates >= cutoff) & lats.notna() & lons.notna()
+    rows = df[recent]
+    if region:
+        rows = rows[_region_mask(rows[0], rows[4], region)]
+    rows = rows.head(limit)
+    paths = rows[0]
+    # Extract WMO/platform: typical path .../profiles/WMO/FILE
+    platforms = platform_numbers(paths).fillna(paths.str.strip("/"))
+
     filtered = []
-    for line in lines:
-        if not line or line.startswith('#'):
-            continue
-        # Basic split; ARGO index columns are 'file, date, lat, lon, ocean, ...'
-        parts = line.split(',')
-        if len(parts) < 5:
-            continue
-        file_path = parts[0].strip()
-        date_str = parts[1].strip()
-        lat_str = parts[2].strip()
-        lon_str = parts[3].strip()
-        ocean_col = parts[4].strip() if len(parts) > 4 else None
-        # Parse date with multiple tolerant formats
-        dt = _parse_index_date(date_str)
-        if not dt:
-            continue
-        if dt < cutoff:
-            continue
-        if not _matches_region(line, region, ocean_col):
-            continue
-        try:
-            lat = float(lat_str)
-            lon = float(lon_str)
-        except Exception:
-            continue
-        # Extract WMO/platform: typical path .../profiles/WMO/FILE
-        parts_path = [p for p in file_path.strip('/').split('/') if p]
-        platform_number = None
-        if len(parts_path) >= 2:
-            candidate = parts_path[-2]
-            # Avoid generic folder names
-            if candidate.lower() in {"profiles", "dac"} and len(parts_path) >= 3:
-                platform_number = parts_path[-3]
-            else:
-                platform_number = candidate
-        else:
-            platform_number = parts_path[-1] if parts_path else "unknown"
+    for platform_number, dt, lat, lon, ocean, file_path in zip(
+        platforms.tolist(),
+        dates[rows.index].to_numpy().astype("datetime64[us]").tolist(),
+        lats[rows.index].tolist(),
+        lons[rows.index].tolist(),
+        rows[4].tolist(),
+        paths.tolist(),
+    ):
         # Prefer ocean value from index if present
+        ocean_col = ocean.strip() if isinstance(ocean, str) else None
         ocean_val = ocean_col or (region or None)
         # Keep reference to file path for potential on-demand fetch later
         filtered.append((platform_number, dt, lat, lon, ocean_val, file_path))
-        if len(filtered) >= limit:
-            break
 
     if not filtered:
         print("No recent entries matched filters.")
         return 0
 
-    # Ensure tables exist
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    async with async_session_factory() as session:
+    async with get_session_factory()() as session:
         async with session.begin():
-            for platform_number, dt, lat, lon, ocean_val, file_path in filtered:
-                await _ensure_float(session, platform_number)
-                await session.execute(
-                    insert(ArgoProfile).values(
-                        platform_number=platform_number,
-                        cycle_number=1,
-                        profile_date=dt,
-                        latitude=lat,
-                        longitude=lon,
-                        ocean_region=ocean_val,
-                        file_path=file_path,
-                        created_at=datetime.utcnow(),
-                    )
+            now = datetime.utcnow()
+            # Unique platforms in first-seen order
+            await _ensure_floats(session, list(dict.fromkeys(row[0] for row in filtered)), now)
+            records = [
+                (platform_number, 1, dt, lat, lon, ocean_val, file_path, now)
+                for platform_number, dt, lat, lon, ocean_val, file_path in filtered
+            ]
+            if IS_POSTGRES:
+                # Binary COPY on the session's connection, so it commits with the transaction
+                conn = await session.connection()
+                raw = (await conn.get_raw_connection()).driver_connection
+                await raw.copy_records_to_table(
+                    ArgoProfile.__tablename__, records=records, columns=PROFILE_COLUMNS
                 )
+            else:
+                await session.execute(insert(ArgoProfile), [dict(zip(PROFILE_COLUMNS, rec)) for rec in records])
         await session.commit()
     print(f"Ingested {len(filtered)} recent profiles from index.")
     return len(filtered)
 
 
 if __name__ == "__main__":
-    asyncio.run(ingest_from_index(settings.INGEST_DAYS_BACK, settings.INGEST_REGION, settings.INGEST_LIMIT))
-    
+    run_main(ingest_from_index(settings.INGEST_DAYS_BACK, settings.INGEST_REGION, settings.INGEST_LIMIT))
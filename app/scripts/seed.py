@@ -1,36 +1,114 @@
-import asyncio
+import argparse
+import csv
 from datetime import datetime
-from sqlalchemy import text
-from ..core.database import engine
-from ..core.database import Base
-# Import models so metadata knows about all tables
-from ..models import argo_data  # noqa: F401
+from sqlalchemy import exists, insert, literal, select, union_all
+from ..core.database import get_engine, IS_POSTGRES
+from ..core.database import create_missing_tables
+# Importing the models also registers all tables on the metadata
+from ..models.argo_data import ArgoProfile
+from .setup_database import ALIGN_SEQUENCE
+from . import run_main
 
+# argo_profiles columns filled by the sample rows, in tuple order
+SEED_COLUMNS = ("platform_number", "cycle_number", "profile_date", "latitude", "longitude", "ocean_region")
 
-async def main():
-    async with engine.begin() as conn:
+# Sample rows, seeded only into an empty table; ids come from the serial sequence and
+# created_at from the column's server default
+SEED_ROWS = (
+    ("PLAT-0001", 1, datetime(2025, 1, 1), 19.07, 72.87, "Arabian Sea"),
+    ("PLAT-0002", 5, datetime(2025, 1, 2), 15.5, 73.2, "Arabian Sea"),
+    ("PLAT-0003", 3, datetime(2025, 1, 3), 12.9, 74.0, "Indian Ocean"),
+)
+
+# Statements are built once at import; each run reuses them (and their compiled form from
+# the engine's statement cache) instead of reconstructing them.
+# The emptiness check is part of the INSERT (... SELECT ... WHERE NOT EXISTS), so seeding
+# or skipping takes one statement and the rowcount tells which happened.
+_SEED_SOURCE = union_all(*(
+    select(*(
+        literal(value, ArgoProfile.__table__.c[name].type).label(name)
+        for name, value in zip(SEED_COLUMNS, row)
+    ))
+    for row in SEED_ROWS
+)).subquery()
+_SEED_INSERT = insert(ArgoProfile).from_select(
+    SEED_COLUMNS,
+    select(*_SEED_SOURCE.c).where(~exists(select(ArgoProfile.id))),
+)
+
+
+# Fixture rows are inserted this many at a time when COPY isn't available
+FIXTURE_BATCH_ROWS = 1000
+
+
+def _fixture_value(column, value: str):
+    # Fixture text -> the column's Python type; empty fields are NULL (as with COPY ... CSV)
+    if value == "":
+        return None
+    python_type = column.type.python_type
+    return datetime.fromisoformat(value) if python_type is datetime else python_type(value)
+
+
+async def _load_fixture(conn, path: str) -> int:
+    """Load a tab-separated file whose header row names argo_profiles columns; returns the row count.
+
+    On Postgres the file is streamed from disk by COPY FROM STDIN; elsewhere it is read row
+    by row and inserted in FIXTURE_BATCH_ROWS batches, so it is never held in memory whole.
+    """
+    with open(path, newline="") as f:
+        columns = next(csv.reader(f, delimiter="\t"))
+    if IS_POSTGRES:
+        raw = (await conn.get_raw_connection()).driver_connection
+        status = await raw.copy_to_table(
+            ArgoProfile.__tablename__, source=path, columns=columns, format="csv", delimiter="\t", header=True
+        )
+        count = int(status.split()[-1])
+        if "id" in columns:
+            # Explicit ids don't advance the serial sequence; move it past them
+            await conn.execute(ALIGN_SEQUENCE)
+        return count
+
+    table = ArgoProfile.__table__
+    count = 0
+    batch: list[dict] = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        next(reader)
+        for row in reader:
+            batch.append({name: _fixture_value(table.c[name], value) for name, value in zip(columns, row)})
+            if len(batch) >= FIXTURE_BATCH_ROWS:
+                await conn.execute(insert(ArgoProfile), batch)
+                count += len(batch)
+                batch = []
+    if batch:
+        await conn.execute(insert(ArgoProfile), batch)
+        count += len(batch)
+    return count
+
+
+async def main(fixture: str | None = None):
+    async with get_engine().begin() as conn:
         # Create tables from ORM metadata (avoids multi-statement issues)
-        await conn.run_sync(Base.metadata.create_all)
-
-        # insert tiny sample if empty
-        res = await conn.execute(text("SELECT COUNT(*) FROM argo_profiles"))
-        count = res.scalar_one()
-        if count == 0:
-            await conn.execute(
-                text(
-                    "INSERT INTO argo_profiles (platform_number, cycle_number, profile_date, latitude, longitude, ocean_region, created_at) "
-                    "VALUES (:plat,:cyc,:dt,:lat,:lon,:reg,:cat)"
-                ),
-                [
-                    {"plat": "PLAT-0001", "cyc": 1, "dt": datetime(2025, 1, 1), "lat": 19.07, "lon": 72.87, "reg": "Arabian Sea", "cat": datetime.utcnow()},
-                    {"plat": "PLAT-0002", "cyc": 5, "dt": datetime(2025, 1, 2), "lat": 15.5, "lon": 73.2, "reg": "Arabian Sea", "cat": datetime.utcnow()},
-                    {"plat": "PLAT-0003", "cyc": 3, "dt": datetime(2025, 1, 3), "lat": 12.9, "lon": 74.0, "reg": "Indian Ocean", "cat": datetime.utcnow()},
-                ],
-            )
-            print("Seeded argo_profiles with 3 rows")
+        await conn.run_sync(create_missing_tables)
+
+        if fixture:
+            count = await _load_fixture(conn, fixture)
+            print(f"Loaded {count} rows into argo_profiles from {fixture}")
+            return
+
+        res = await conn.execute(_SEED_INSERT)
+        if res.rowcount > 0:
+            print(f"Seeded argo_profiles with {res.rowcount} rows")
         else:
-            print(f"argo_profiles has {count} rows; skipping seed")
+            print("argo_profiles is not empty; skipping seed")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Seed argo_profiles with sample rows.")
+    parser.add_argument(
+        "--fixture",
+        help="Tab-separated file with a header row of argo_profiles column names to load "
+        "instead of the built-in three sample rows",
+    )
+    args = parser.parse_args()
+    run_main(main(fixture=args.fixture))
@@ -1,32 +1,103 @@
-import asyncio
+import argparse
+import hashlib
 from sqlalchemy import text
-from ..core.database import engine, Base
+from sqlalchemy.schema import CreateIndex, CreateTable
+from ..core.database import get_engine, Base, IS_POSTGRES, create_missing_tables
 # Ensure models are imported so metadata contains tables
-from ..models import argo_data  # noqa: F401
+from .. import models  # noqa: F401
+from . import run_main
 
 
-async def main():
-    # Create all tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        # Ensure new nullable columns exist when not using migrations
-        try:
-            # Postgres supports IF NOT EXISTS
-            await conn.execute(text("ALTER TABLE argo_profiles ADD COLUMN IF NOT EXISTS file_path TEXT"))
-        except Exception:
-            # SQLite path (no IF NOT EXISTS) — try plain add and ignore if already exists
-            try:
-                await conn.execute(text("ALTER TABLE argo_profiles ADD COLUMN file_path TEXT"))
-            except Exception:
-                pass
-        # Align sequences with current max(id) after manual inserts or seeds
+# Single-column indexes superseded by composites that lead with the same column
+_SUPERSEDED_INDEXES = (
+    "ix_argo_profiles_platform_number",
+    "ix_argo_profiles_ocean_region",
+    "ix_argo_measurements_profile_id",
+)
+
+
+# Bump when the migration steps in _migrate() change, so databases set up earlier rerun them
+SETUP_REVISION = 1
+
+# Fingerprint of the last completed setup, so unchanged databases skip the DDL probes
+_SCHEMA_VERSION_DDL = text(
+    "CREATE TABLE IF NOT EXISTS schema_version (key VARCHAR(64) PRIMARY KEY, value VARCHAR(128) NOT NULL)"
+)
+_SCHEMA_VERSION_GET = text("SELECT value FROM schema_version WHERE key = 'fingerprint'")
+_SCHEMA_VERSION_SET = text(
+    "INSERT INTO schema_version (key, value) VALUES ('fingerprint', :value) "
+    "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+)
+
+# Move the argo_profiles id sequence past the highest id (Postgres); also used by seed
+ALIGN_SEQUENCE = text(
+    "SELECT setval(pg_get_serial_sequence('argo_profiles','id'), COALESCE((SELECT MAX(id) FROM argo_profiles), 0) + 1, false)"
+)
+_PING = text("SELECT 1")
+
+
+def _schema_fingerprint(dialect) -> str:
+    """Hash of the compiled DDL for every table and index, plus the migration steps' revision."""
+    h = hashlib.blake2b(digest_size=16)
+    for table in Base.metadata.sorted_tables:
+        h.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            h.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    h.update(f"{SETUP_REVISION}:{_SUPERSEDED_INDEXES}".encode())
+    return h.hexdigest()
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    # create_all() skips indexes on tables that already exist; add any declared since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def _migrate(conn) -> None:
+    """Bring an existing database up to the models: tables, added columns, defaults, indexes."""
+    await conn.run_sync(create_missing_tables)
+    # Ensure new nullable columns exist when not using migrations
+    try:
+        # Postgres supports IF NOT EXISTS
+        await conn.execute(text("ALTER TABLE argo_profiles ADD COLUMN IF NOT EXISTS file_path TEXT"))
+    except Exception:
+        # SQLite path (no IF NOT EXISTS) — try plain add and ignore if already exists
         try:
-            await conn.execute(text("SELECT setval(pg_get_serial_sequence('argo_profiles','id'), COALESCE((SELECT MAX(id) FROM argo_profiles), 0) + 1, false)"))
+            await conn.execute(text("ALTER TABLE argo_profiles ADD COLUMN file_path TEXT"))
         except Exception:
             pass
-        # Simple sanity check query depending on dialect
+    if IS_POSTGRES:
+        # created_at defaults to now() server-side; tables created before that get the default here
+        # (SQLite can't alter a column default, so older SQLite tables keep NULL when it's omitted)
+        for table in Base.metadata.sorted_tables:
+            if "created_at" in table.c:
+                await conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN created_at SET DEFAULT now()"))
+    await conn.run_sync(_create_missing_indexes)
+    for name in _SUPERSEDED_INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+async def main(align_sequences: bool = True, force: bool = False):
+    async with get_engine().begin() as conn:
+        # Skip the migration (and its per-table/per-index probes) when the models haven't
+        # changed since the last successful setup of this database
+        fingerprint = _schema_fingerprint(conn.dialect)
+        await conn.execute(_SCHEMA_VERSION_DDL)
+        stored = (await conn.execute(_SCHEMA_VERSION_GET)).scalar()
+        if force or stored != fingerprint:
+            await _migrate(conn)
+            await conn.execute(_SCHEMA_VERSION_SET, {"value": fingerprint})
+        else:
+            print("Schema unchanged since last setup; skipping DDL.")
+        # One round trip for the post-DDL work. On Postgres, aligning the id sequence with the
+        # current max(id) (after manual inserts or seeds) doubles as the connection check;
+        # asyncpg can't send several statements in one call, so it is a single SELECT.
         try:
-            await conn.execute(text("SELECT 1"))
+            if IS_POSTGRES and align_sequences:
+                await conn.execute(ALIGN_SEQUENCE)
+            else:
+                await conn.execute(_PING)
             print("Database connection OK and tables ensured.")
         except Exception as e:
             print(f"Connection check failed: {e}")
@@ -34,4 +105,17 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Create missing tables, columns and indexes.")
+    parser.add_argument(
+        "--align-sequences",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Postgres only: reset the argo_profiles id sequence to max(id) + 1 (default: on)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run the migration steps even if the stored schema fingerprint matches",
+    )
+    args = parser.parse_args()
+    run_main(main(align_sequences=args.align_sequences, force=args.force))
@@ -1,34 +1,40 @@
-import asyncio
-import os
+import sys
 from sqlalchemy import select, func
 from sqlalchemy.exc import SQLAlchemyError
-from ..core.config import settings
-from ..core.database import async_session_factory, engine
+from ..core.config import get_settings
+from ..core.database import get_engine
 from ..models.argo_data import ArgoProfile, ArgoFloat
+from . import run_main
+
+settings = get_settings()
 
 
 async def main():
     print(f"DATABASE_URL={settings.DATABASE_URL}")
+    engine = get_engine()
     try:
-        async with engine.begin() as conn:
-            await conn.execute(select(func.now()) if settings.DATABASE_URL.startswith("postgresql") else select(func.count().label("c")).select_from(ArgoProfile))
-        print("Engine connect OK")
-    except SQLAlchemyError as e:
-        print(f"Engine connect failed: {e}")
-        raise
-
-    async with async_session_factory() as session:
-        try:
-            profs = await session.scalar(select(func.count()).select_from(ArgoProfile))
-            floats = await session.scalar(select(func.count()).select_from(ArgoFloat))
+        # A plain connection in autocommit mode: a single read needs no BEGIN/ROLLBACK around it
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            # Both counts in one round trip; the query succeeding also proves connectivity
+            stmt = select(
+                select(func.count()).select_from(ArgoProfile).scalar_subquery().label("profiles"),
+                select(func.count()).select_from(ArgoFloat).scalar_subquery().label("floats"),
+            )
+            try:
+                profs, floats = (await conn.execute(stmt)).one()
+            except SQLAlchemyError as e:
+                print(f"Query failed: {e}")
+                raise
+            print("Engine connect OK")
             print({"profiles": profs or 0, "floats": floats or 0})
-        except SQLAlchemyError as e:
-            print(f"Query failed: {e}")
-            raise
+    finally:
+        # Close pooled connections before the loop ends so the server backends go away now
+        await engine.dispose()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        run_main(main())
     except Exception:
-        os._exit(1)
+        sys.exit(1)